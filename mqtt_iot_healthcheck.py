@@ -1,16 +1,68 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
+import atexit
+import gzip
+import logging
+import logging.handlers
+import queue
+import signal
+import socket
+import sys
 import time
 import threading
-from datetime import datetime, timedelta
+from collections import deque
 from typing import Dict, Optional
 import paho.mqtt.client as mqtt
-from flask import Flask, render_template, jsonify, send_from_directory
+from paho.mqtt.matcher import MQTTMatcher
+from flask import Flask, Response, render_template, request, send_from_directory
+import orjson
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from waitress import serve
 import os
 from dotenv import load_dotenv
 
+log = logging.getLogger('mqtt_health')
+
+# Label names shared by all per-topic metrics on /metrics
+_PROM_LABEL_NAMES = ('topic', 'display_name', 'type')
+
+class _MetricFamilies:
+    """Collector handing already-built metric families to generate_latest()"""
+    def __init__(self, families):
+        self._families = families
+    
+    def collect(self):
+        return self._families
+
+class _CachedView:
+    """Responses computed from one snapshot, shared by requests within the cache TTL"""
+    __slots__ = ('computed_at', 'metrics', 'metrics_gzip', 'status_json')
+    
+    def __init__(self, computed_at: float, metrics: bytes, status_json: bytes):
+        self.computed_at = computed_at  # time.monotonic() of the recompute
+        self.metrics = metrics
+        self.metrics_gzip: Optional[bytes] = None  # Filled in on first gzip request
+        self.status_json = status_json
+
+def _format_interval(avg_seconds: Optional[float]) -> str:
+    """Format an average interval in seconds as a human readable string"""
+    if avg_seconds is None:
+        return "No data"
+    
+    if avg_seconds < 60:
+        return f"{avg_seconds:.1f}s"
+    elif avg_seconds < 3600:
+        minutes = avg_seconds / 60
+        return f"{minutes:.1f}m"
+    elif avg_seconds < 86400:
+        hours = avg_seconds / 3600
+        return f"{hours:.1f}h"
+    else:
+        days = avg_seconds / 86400
+        return f"{days:.1f}d"
+
 class MQTTHealthChecker:
     def __init__(self, broker_host: str = "localhost", broker_port: int = 1883, 
                  broker_username: Optional[str] = None, broker_password: Optional[str] = None,
@@ -20,63 +72,138 @@ class MQTTHealthChecker:
         self.broker_username = broker_username
         self.broker_password = broker_password
         self.topics_file = topics_file
-        self.topic_timestamps: Dict[str, datetime] = {}
+        self.topic_timestamps: Dict[str, float] = {}  # Epoch seconds of last message for each topic
         self.topic_counters: Dict[str, int] = {}
-        self.topic_message_history: Dict[str, list] = {}  # Store last N timestamps for each topic
+        self.topic_message_history: Dict[str, deque] = {}  # Ring buffer of last N monotonic timestamps for each topic
         self.topics: list = []
         self.topic_descriptions: Dict[str, str] = {}
         self.topic_types: Dict[str, str] = {}
+        self._topic_meta: tuple = ()  # (topic, display_name, type) for each topic, in config order
+        self._known_topics: frozenset = frozenset()  # Configured topics without wildcards
+        self._tracked_topics: frozenset = frozenset()  # All configured topics and patterns
+        self._wildcard_matcher: Optional[MQTTMatcher] = None  # Configured '+'/'#' patterns, if any
         self.max_history_size = 100  # Keep last 100 timestamps for average calculation
         self.client: Optional[mqtt.Client] = None
-        self.lock = threading.Lock()
+        # No lock: single dict/deque operations are atomic under the GIL. Only the paho network
+        # thread adds to the per-topic dicts; reload_topics (main thread) only removes topics it
+        # has already dropped from the config, and _record_message re-checks the config after
+        # writing so a racing message cannot recreate a removed topic. Readers work from copies.
+        
+        # Status/metrics polls within the TTL share one computed snapshot and its encoded responses
+        self._view_cache: Optional[_CachedView] = None
+        self._cache_ttl = 0.5  # seconds
         
         self.load_topics()
         self.setup_mqtt()
         
     def load_topics(self):
         """Load topics from JSON configuration file"""
+        entries = self._read_topics_file()
+        if entries is None:
+            log.warning("Using empty topics list.")
+            entries = []
+        self._apply_topics(entries)
+    
+    def reload_topics(self):
+        """Re-read the topics file and (un)subscribe only the topics that changed"""
+        entries = self._read_topics_file()
+        if entries is None:
+            log.warning("Keeping current topics list.")
+            return
+        
+        old_topics = set(self.topics)
+        self._apply_topics(entries)
+        new_topics = set(self.topics)
+        added = new_topics - old_topics
+        removed = old_topics - new_topics
+        
+        # Subscriptions for the full list are (re)sent by on_connect if not connected now
+        if self.client is not None and self.client.is_connected():
+            if added:
+                self.client.subscribe([(topic, 0) for topic in added])
+            if removed:
+                self.client.unsubscribe(list(removed))
+        
+        # Drop state of removed topics; topics still present keep their history.
+        # Runs after _apply_topics so _record_message's re-check covers a racing write.
+        for topic in removed:
+            self.topic_timestamps.pop(topic, None)
+            self.topic_counters.pop(topic, None)
+            self.topic_message_history.pop(topic, None)
+        
+        self._view_cache = None
+        log.info("Reloaded %s: %d topics (%d added, %d removed)",
+                 self.topics_file, len(self.topics), len(added), len(removed))
+    
+    def _read_topics_file(self) -> Optional[list]:
+        """Read (topic, description, type) entries from the topics file, or None if unreadable"""
         try:
-            with open(self.topics_file, 'r') as f:
-                config = json.load(f)
-                topics_data = config.get('topics', [])
-                
-                self.topics = []
-                self.topic_descriptions = {}
-                self.topic_types = {}
-                
-                for item in topics_data:
-                    if isinstance(item, str):
-                        # Legacy format: just topic string
-                        topic = item
-                        self.topics.append(topic)
-                    elif isinstance(item, dict):
-                        # New format: object with topic and optional description/type
-                        topic = item.get('topic', '')
-                        description = item.get('description', '')
-                        topic_type = item.get('type', '')
-                        if topic:
-                            self.topics.append(topic)
-                            if description:
-                                self.topic_descriptions[topic] = description
-                            if topic_type:
-                                self.topic_types[topic] = topic_type
-                        
+            with open(self.topics_file, 'rb') as f:
+                config = orjson.loads(f.read())
         except FileNotFoundError:
-            print(f"Topics file {self.topics_file} not found. Using empty topics list.")
-            self.topics = []
-            self.topic_descriptions = {}
-            self.topic_types = {}
-            self.topic_message_history = {}
-        except json.JSONDecodeError:
-            print(f"Error parsing {self.topics_file}. Using empty topics list.")
-            self.topics = []
-            self.topic_descriptions = {}
-            self.topic_types = {}
-            self.topic_message_history = {}
+            log.warning("Topics file %s not found.", self.topics_file)
+            return None
+        except OSError as e:
+            log.error("Error reading %s: %s", self.topics_file, e)
+            return None
+        except orjson.JSONDecodeError:
+            log.error("Error parsing %s.", self.topics_file)
+            return None
+        
+        topics_data = config.get('topics', []) if isinstance(config, dict) else None
+        if not isinstance(topics_data, list):
+            log.error("Error parsing %s: expected an object with a \"topics\" list.", self.topics_file)
+            return None
+        
+        # Entries are either a bare topic string (legacy format) or an object
+        # with topic and optional description/type; malformed entries are skipped
+        entries = []
+        for item in topics_data:
+            if isinstance(item, dict):
+                topic = item.get('topic', '')
+                description = item.get('description')
+                topic_type = item.get('type')
+            else:
+                topic, description, topic_type = item, '', ''
+            if not isinstance(topic, str):
+                log.warning("Skipping invalid topic entry %r in %s.", item, self.topics_file)
+                continue
+            if topic:
+                entries.append((topic,
+                                description if isinstance(description, str) else '',
+                                topic_type if isinstance(topic_type, str) else ''))
+        return entries
+    
+    def _apply_topics(self, entries: list):
+        """Replace the monitored topics and rebuild everything derived from them"""
+        self.topics = [topic for topic, _, _ in entries]
+        self.topic_descriptions = {topic: description for topic, description, _ in entries if description}
+        self.topic_types = {topic: topic_type for topic, _, topic_type in entries if topic_type}
+        
+        self._topic_meta = tuple(
+            (topic, self.topic_descriptions.get(topic, topic), self.topic_types.get(topic, 'unknown'))
+            for topic in self.topics
+        )
+        
+        # Messages are only tracked for configured topics. Wildcard subscriptions are
+        # tracked under their pattern, so the per-topic dicts stay bounded by the config.
+        wildcards = [topic for topic in self.topics if '+' in topic or '#' in topic]
+        self._tracked_topics = frozenset(self.topics)
+        self._known_topics = self._tracked_topics.difference(wildcards)
+        if wildcards:
+            matcher = MQTTMatcher()
+            for pattern in wildcards:
+                matcher[pattern] = pattern
+            self._wildcard_matcher = matcher
+        else:
+            self._wildcard_matcher = None
     
     def setup_mqtt(self):
         """Setup MQTT client and callbacks"""
-        self.client = mqtt.Client()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, transport='tcp')
+        
+        # Back off 1s..30s between reconnect attempts after the broker goes away
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
         
         # Set username and password if provided
         if self.broker_username and self.broker_password:
@@ -85,123 +212,223 @@ class MQTTHealthChecker:
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_socket_open = self.on_socket_open
         
-    def on_connect(self, client, userdata, flags, rc):
+    def on_socket_open(self, client, userdata, sock):
+        """Callback for when the broker socket is opened"""
+        # Don't let Nagle's algorithm hold back small control packets (SUBSCRIBE, PINGREQ)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass
+    
+    def on_connect(self, client, userdata, flags, reason_code, properties):
         """Callback for when client connects to MQTT broker"""
-        if rc == 0:
-            print(f"Connected to MQTT broker at {self.broker_host}:{self.broker_port}")
-            for topic in self.topics:
-                client.subscribe(topic)
-                print(f"Subscribed to topic: {topic}")
+        if not reason_code.is_failure:
+            log.info("Connected to MQTT broker at %s:%s", self.broker_host, self.broker_port)
+            # One SUBSCRIBE packet carrying every topic filter
+            if self.topics:
+                client.subscribe([(topic, 0) for topic in self.topics])
+                log.info("Subscribed to %d topics", len(self.topics))
         else:
-            print(f"Failed to connect to MQTT broker. Return code: {rc}")
+            log.error("Failed to connect to MQTT broker. Reason: %s", reason_code)
     
     def on_message(self, client, userdata, msg):
         """Callback for when a message is received"""
         topic = msg.topic
-        current_time = datetime.now()
+        wildcard_matcher = self._wildcard_matcher
         
-        with self.lock:
-            self.topic_timestamps[topic] = current_time
-            self.topic_counters[topic] = self.topic_counters.get(topic, 0) + 1
-            
-            # Add timestamp to message history for average calculation
-            if topic not in self.topic_message_history:
-                self.topic_message_history[topic] = []
-            
-            self.topic_message_history[topic].append(current_time)
-            
-            # Keep only the last N timestamps to limit memory usage
-            if len(self.topic_message_history[topic]) > self.max_history_size:
-                self.topic_message_history[topic] = self.topic_message_history[topic][-self.max_history_size:]
+        if topic in self._known_topics:
+            self._record_message(topic)
+        if wildcard_matcher is not None:
+            for pattern in wildcard_matcher.iter_match(topic):
+                self._record_message(pattern)
+        
+        log.debug("Received message on topic: %s", topic)
+    
+    def _record_message(self, topic: str):
+        """Record arrival of a message for a configured topic or pattern"""
+        current_time = time.time()
+        
+        self.topic_timestamps[topic] = current_time
+        self.topic_counters[topic] = self.topic_counters.get(topic, 0) + 1
+        
+        # Add timestamp to message history for average calculation; the bounded
+        # deque drops the oldest entry itself once max_history_size is reached.
+        # Intervals use the monotonic clock so wall-clock adjustments don't skew them.
+        history = self.topic_message_history.get(topic)
+        if history is None:
+            history = self.topic_message_history[topic] = deque(maxlen=self.max_history_size)
+        history.append(time.monotonic())
         
-        print(f"Received message on topic: {topic}")
+        # A reload may have dropped this topic after on_message matched it but before the
+        # writes above, in which case its cleanup could have run first; undo them here
+        if topic not in self._tracked_topics:
+            self.topic_timestamps.pop(topic, None)
+            self.topic_counters.pop(topic, None)
+            self.topic_message_history.pop(topic, None)
     
-    def on_disconnect(self, client, userdata, rc):
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
         """Callback for when client disconnects"""
-        print("Disconnected from MQTT broker")
+        log.info("Disconnected from MQTT broker. Reason: %s", reason_code)
         
     def start_mqtt(self):
         """Start MQTT client in background thread"""
         def mqtt_loop():
             try:
-                self.client.connect(self.broker_host, self.broker_port, 60)
-                self.client.loop_forever()
+                # Connect inside the loop so an unreachable broker at startup is retried
+                # with the same backoff as a later disconnect
+                self.client.connect_async(self.broker_host, self.broker_port, 60)
+                self.client.loop_forever(retry_first_connection=True)
             except Exception as e:
-                print(f"MQTT connection error: {e}")
+                log.error("MQTT connection error: %s", e)
         
         mqtt_thread = threading.Thread(target=mqtt_loop, daemon=True)
         mqtt_thread.start()
         
+    def _snapshot(self):
+        """Get raw status values for all topics (epoch seconds, counts, health flags)"""
+        current_time = time.time()
+        snapshot = []
+        
+        # Copy the writer-owned dicts once (a single C-level call each) so the loop
+        # below never blocks or races the MQTT thread
+        timestamps = self.topic_timestamps.copy()
+        counters = self.topic_counters.copy()
+        
+        for topic, display_name, topic_type in self._topic_meta:
+            last_seen_ts = timestamps.get(topic)
+            if last_seen_ts is not None:
+                time_since_seconds = current_time - last_seen_ts
+                status = "healthy" if time_since_seconds < 3600 else "unhealthy"
+            else:
+                time_since_seconds = None
+                status = "never_seen"
+            
+            snapshot.append({
+                'topic': topic,
+                'display_name': display_name,
+                'type': topic_type,
+                'last_seen_ts': last_seen_ts,
+                'time_since_seconds': time_since_seconds,
+                'message_count': counters.get(topic, 0),
+                'avg_interval_seconds': self._avg_interval_seconds(topic),
+                'status': status,
+                'status_int': 1 if status == "healthy" else 0
+            })
+        
+        return snapshot
+    
+    def _cached_view(self) -> _CachedView:
+        """Get the encoded responses, recomputed at most once per cache TTL"""
+        now = time.monotonic()
+        view = self._view_cache
+        if view is not None and now - view.computed_at < self._cache_ttl:
+            return view
+        
+        snapshot = self._snapshot()
+        view = _CachedView(now, self._render_metrics(snapshot), orjson.dumps(self._format_status(snapshot)))
+        self._view_cache = view
+        return view
+    
+    def get_metrics(self, gzipped: bool = False) -> bytes:
+        """Get Prometheus exposition text for all topics, optionally gzip-compressed"""
+        view = self._cached_view()
+        if not gzipped:
+            return view.metrics
+        
+        # Compress at most once per cached view, and only when a client asks for it
+        if view.metrics_gzip is None:
+            view.metrics_gzip = gzip.compress(view.metrics, compresslevel=1)
+        return view.metrics_gzip
+    
+    def _render_metrics(self, snapshot) -> bytes:
+        """Build Prometheus exposition text from a snapshot"""
+        last_seen = GaugeMetricFamily('mqtt_topic_last_seen_timestamp',
+                                      'Unix timestamp of last message received for each topic',
+                                      labels=_PROM_LABEL_NAMES)
+        message_count = CounterMetricFamily('mqtt_topic_message_count',
+                                            'Total number of messages received for each topic',
+                                            labels=_PROM_LABEL_NAMES)
+        healthy = GaugeMetricFamily('mqtt_topic_healthy',
+                                    'Whether the topic is considered healthy (1) or not (0)',
+                                    labels=_PROM_LABEL_NAMES)
+        avg_interval = GaugeMetricFamily('mqtt_topic_avg_interval_seconds',
+                                         'Average interval between messages in seconds',
+                                         labels=_PROM_LABEL_NAMES)
+        
+        for row in snapshot:
+            label_values = (row['topic'], row['display_name'], row['type'])
+            
+            # Last seen timestamp metric (0 if never seen)
+            last_seen_ts = row['last_seen_ts']
+            last_seen.add_metric(label_values, last_seen_ts if last_seen_ts is not None else 0)
+            
+            message_count.add_metric(label_values, row['message_count'])
+            
+            # Health status metric (1 for healthy, 0 for unhealthy/never_seen)
+            healthy.add_metric(label_values, row['status_int'])
+            
+            avg_interval_seconds = row['avg_interval_seconds']
+            if avg_interval_seconds:
+                avg_interval.add_metric(label_values, avg_interval_seconds)
+        
+        # prometheus_client handles label escaping and the exposition format
+        registry = CollectorRegistry(auto_describe=False)
+        registry.register(_MetricFamilies([last_seen, message_count, healthy, avg_interval]))
+        return generate_latest(registry)
+    
     def get_status_data(self):
         """Get current status data for all topics"""
-        current_time = datetime.now()
+        # Built fresh per call so callers can't alter what the cached responses were made from
+        return self._format_status(self._snapshot())
+    
+    def get_status_json(self) -> bytes:
+        """Get current status data for all topics, encoded as JSON"""
+        return self._cached_view().status_json
+    
+    def _format_status(self, snapshot):
+        """Format a snapshot for display in the web UI"""
         status_data = []
         
-        with self.lock:
-            for topic in self.topics:
-                if topic in self.topic_timestamps:
-                    last_seen = self.topic_timestamps[topic]
-                    time_diff = current_time - last_seen
-                    status = "healthy" if time_diff < timedelta(hours=1) else "unhealthy"
-                else:
-                    last_seen = None
-                    time_diff = None
-                    status = "never_seen"
-                
-                message_count = self.topic_counters.get(topic, 0)
-                display_name = self.topic_descriptions.get(topic, topic)
-                topic_type = self.topic_types.get(topic, 'unknown')
-                
-                # Calculate average time between messages
-                avg_interval = self._calculate_average_interval(topic)
-                
-                status_data.append({
-                    'topic': topic,
-                    'display_name': display_name,
-                    'type': topic_type,
-                    'last_seen': last_seen.strftime('%Y-%m-%d %H:%M:%S') if last_seen else 'Never',
-                    'time_since': str(time_diff).split('.')[0] if time_diff else 'Never',
-                    'message_count': message_count,
-                    'avg_interval': avg_interval,
-                    'status': status
-                })
+        for row in snapshot:
+            last_seen_ts = row['last_seen_ts']
+            if last_seen_ts is not None:
+                last_seen = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_seen_ts))
+                hours, remainder = divmod(int(row['time_since_seconds']), 3600)
+                minutes, seconds = divmod(remainder, 60)
+                time_since = f"{hours}:{minutes:02d}:{seconds:02d}"
+            else:
+                last_seen = 'Never'
+                time_since = 'Never'
+            
+            status_data.append({
+                'topic': row['topic'],
+                'display_name': row['display_name'],
+                'type': row['type'],
+                'last_seen': last_seen,
+                'time_since': time_since,
+                'message_count': row['message_count'],
+                'avg_interval': _format_interval(row['avg_interval_seconds']),
+                'status': row['status']
+            })
         
         return status_data
     
-    def _calculate_average_interval(self, topic: str) -> str:
-        """Calculate average time between messages for a topic"""
-        if topic not in self.topic_message_history:
-            return "No data"
-        
-        timestamps = self.topic_message_history[topic]
-        if len(timestamps) < 2:
-            return "No data"
-        
-        # Calculate intervals between consecutive messages
-        intervals = []
-        for i in range(1, len(timestamps)):
-            interval = (timestamps[i] - timestamps[i-1]).total_seconds()
-            intervals.append(interval)
-        
-        if not intervals:
-            return "No data"
-        
-        # Calculate average interval in seconds
-        avg_seconds = sum(intervals) / len(intervals)
-        
-        # Format as human readable string
-        if avg_seconds < 60:
-            return f"{avg_seconds:.1f}s"
-        elif avg_seconds < 3600:
-            minutes = avg_seconds / 60
-            return f"{minutes:.1f}m"
-        elif avg_seconds < 86400:
-            hours = avg_seconds / 3600
-            return f"{hours:.1f}h"
-        else:
-            days = avg_seconds / 86400
-            return f"{days:.1f}d"
+    def _avg_interval_seconds(self, topic: str) -> Optional[float]:
+        """Calculate average time in seconds between messages for a topic"""
+        timestamps = self.topic_message_history.get(topic)
+        if not timestamps:
+            return None
+        
+        # Read the length before the endpoints: a concurrent append can only make the
+        # last timestamp newer, never leave it missing
+        count = len(timestamps)
+        if count < 2:
+            return None
+        
+        # The mean of consecutive intervals telescopes to (last - first) / (n - 1)
+        return (timestamps[-1] - timestamps[0]) / (count - 1)
 
 # Flask web application
 app = Flask(__name__)
@@ -216,8 +443,8 @@ def index():
 def get_status():
     """API endpoint to get current status data"""
     if health_checker:
-        return jsonify(health_checker.get_status_data())
-    return jsonify([])
+        return Response(health_checker.get_status_json(), mimetype='application/json')
+    return Response(b'[]', mimetype='application/json')
 
 @app.route('/static/icons/<filename>')
 def serve_icon(filename):
@@ -228,73 +455,30 @@ def serve_icon(filename):
 def get_metrics():
     """Prometheus metrics endpoint"""
     if not health_checker:
-        return "# No health checker initialized\n", 200, {'Content-Type': 'text/plain'}
-    
-    status_data = health_checker.get_status_data()
-    metrics_lines = []
-    
-    # Add help and type information
-    metrics_lines.append("# HELP mqtt_topic_last_seen_timestamp Unix timestamp of last message received for each topic")
-    metrics_lines.append("# TYPE mqtt_topic_last_seen_timestamp gauge")
-    metrics_lines.append("# HELP mqtt_topic_message_count Total number of messages received for each topic")
-    metrics_lines.append("# TYPE mqtt_topic_message_count counter")
-    metrics_lines.append("# HELP mqtt_topic_healthy Whether the topic is considered healthy (1) or not (0)")
-    metrics_lines.append("# TYPE mqtt_topic_healthy gauge")
-    metrics_lines.append("# HELP mqtt_topic_avg_interval_seconds Average interval between messages in seconds")
-    metrics_lines.append("# TYPE mqtt_topic_avg_interval_seconds gauge")
+        return "# No health checker initialized\n", 200, {'Content-Type': CONTENT_TYPE_LATEST}
     
-    current_time = datetime.now()
-    
-    for topic_data in status_data:
-        topic = topic_data['topic']
-        # Sanitize topic name for Prometheus (replace invalid characters with underscores)
-        safe_topic = topic.replace('/', '_').replace('-', '_').replace('.', '_').replace(':', '_').replace(' ', '_')
-        display_name = topic_data['display_name']
-        topic_type = topic_data['type']
-        message_count = topic_data['message_count']
-        status = topic_data['status']
-        
-        # Calculate timestamp for last seen
-        if topic_data['last_seen'] != 'Never':
-            last_seen_dt = datetime.strptime(topic_data['last_seen'], '%Y-%m-%d %H:%M:%S')
-            last_seen_timestamp = last_seen_dt.timestamp()
-        else:
-            last_seen_timestamp = 0
-        
-        # Convert average interval to seconds
-        avg_interval_str = topic_data['avg_interval']
-        avg_interval_seconds = 0
-        if avg_interval_str != "No data":
-            if avg_interval_str.endswith('s'):
-                avg_interval_seconds = float(avg_interval_str[:-1])
-            elif avg_interval_str.endswith('m'):
-                avg_interval_seconds = float(avg_interval_str[:-1]) * 60
-            elif avg_interval_str.endswith('h'):
-                avg_interval_seconds = float(avg_interval_str[:-1]) * 3600
-            elif avg_interval_str.endswith('d'):
-                avg_interval_seconds = float(avg_interval_str[:-1]) * 86400
-        
-        # Labels for metrics
-        labels = f'topic="{topic}",display_name="{display_name}",type="{topic_type}"'
-        
-        # Last seen timestamp metric
-        metrics_lines.append(f'mqtt_topic_last_seen_timestamp{{{labels}}} {last_seen_timestamp}')
-        
-        # Message count metric
-        metrics_lines.append(f'mqtt_topic_message_count{{{labels}}} {message_count}')
-        
-        # Health status metric (1 for healthy, 0 for unhealthy/never_seen)
-        healthy_value = 1 if status == "healthy" else 0
-        metrics_lines.append(f'mqtt_topic_healthy{{{labels}}} {healthy_value}')
-        
-        # Average interval metric
-        if avg_interval_seconds > 0:
-            metrics_lines.append(f'mqtt_topic_avg_interval_seconds{{{labels}}} {avg_interval_seconds}')
+    # Prometheus accepts gzip; the repetitive label prefixes compress very well
+    use_gzip = request.accept_encodings['gzip'] > 0
+    response = Response(health_checker.get_metrics(gzipped=use_gzip), content_type=CONTENT_TYPE_LATEST)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Route log records through a queue so callbacks never block on stream writes"""
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
     
-    # Join all metrics with newlines and add final newline
-    metrics_content = '\n'.join(metrics_lines) + '\n'
+    log.setLevel(level)
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.propagate = False
     
-    return metrics_content, 200, {'Content-Type': 'text/plain'}
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
 
 def main():
     global health_checker
@@ -314,9 +498,20 @@ def main():
                         help='MQTT broker password (default: MQTT_PASSWORD env var)')
     parser.add_argument('--topics-file', default=os.getenv('MQTT_TOPICS_FILE', 'topics.json'),
                         help='JSON file containing topics to monitor (default: topics.json or MQTT_TOPICS_FILE env var)')
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'INFO'),
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], type=str.upper,
+                        help='Logging level; DEBUG logs every received message (default: INFO or LOG_LEVEL env var)')
     
     args = parser.parse_args()
     
+    # Log from a background thread; the MQTT callbacks only enqueue records.
+    # Stopping the listener at exit flushes records still in the queue.
+    log_listener = setup_logging(getattr(logging, args.log_level))
+    atexit.register(log_listener.stop)
+    
+    # Turn SIGTERM (e.g. `docker stop`) into a normal exit so atexit handlers run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     # Initialize MQTT health checker with command line arguments
     health_checker = MQTTHealthChecker(
         broker_host=args.host,
@@ -326,15 +521,24 @@ def main():
         topics_file=args.topics_file
     )
     
-    # Start MQTT client
+    # Start MQTT client; the web endpoints report from whatever has been received so far,
+    # so there is no need to wait for the broker connection before serving
     health_checker.start_mqtt()
     
-    # Give MQTT client time to connect
-    time.sleep(2)
+    # Re-read the topics file on SIGHUP (e.g. `kill -HUP <pid>`) instead of restarting
+    if hasattr(signal, 'SIGHUP'):
+        def handle_sighup(signum, frame):
+            # Runs inside the web server's loop on the main thread; never let it escape
+            try:
+                health_checker.reload_topics()
+            except Exception:
+                log.exception("Failed to reload topics from %s", health_checker.topics_file)
+        
+        signal.signal(signal.SIGHUP, handle_sighup)
     
-    # Start Flask web server
-    print("Starting web server on http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    # Start production WSGI server
+    log.info("Starting web server on http://localhost:5000")
+    serve(app, host='0.0.0.0', port=5000, threads=4, ident=None)
 
 if __name__ == "__main__":
     main()